@@ -1,9 +1,14 @@
 from datetime import datetime
 
 import click
+import requests
+from loguru import logger
 
 from . import HOME_FOLDER
-from .scrape import WebScraper
+from .scrape import URL, WebScraper
+
+# Where we store the version of the page from the last scrape
+ETAG_FILE = HOME_FOLDER / ".cache" / "etag"
 
 
 @click.group()
@@ -33,9 +38,21 @@ def cli():
     type=int,
     help="Only scrape this many results (testing purposes).",
 )
-def run(debug=False, browser="firefox", log_freq=10, max_results=None):
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Scrape even if the page hasn't changed since the last scrape.",
+)
+def run(debug=False, browser="firefox", log_freq=10, max_results=None, force=False):
     """Run scraper."""
 
+    # Check whether the page changed since the last scrape
+    etag = get_page_etag()
+    if not force and etag is not None and ETAG_FILE.exists():
+        if ETAG_FILE.read_text() == etag:
+            logger.info("No change since last scrape")
+            return
+
     # Initialize the scraper
     scraper = WebScraper(debug=debug, browser=browser)
 
@@ -50,3 +67,24 @@ def run(debug=False, browser="firefox", log_freq=10, max_results=None):
     tag = datetime.now().strftime("%Y-%m-%d__%H-%M-%S")
     output_file = output_folder / f"doge_savings_cfpb_{tag}.csv"
     data.to_csv(output_file, index=False)
+
+    # Save the page version for next time, but only for full scrapes where every
+    # USA Spending lookup worked, so failed rows get retried on the next run
+    complete = max_results is None and data["internal_id"].notna().all()
+    if etag is not None and not complete:
+        logger.info("Some rows are incomplete, not saving the page version")
+    elif etag is not None:
+        ETAG_FILE.parent.mkdir(exist_ok=True)
+        ETAG_FILE.write_text(etag)
+
+
+def get_page_etag():
+    """Get the ETag (or Last-Modified) of the savings page, if it has one."""
+    try:
+        resp = requests.head(URL, allow_redirects=True, timeout=30)
+        resp.raise_for_status()
+    except requests.RequestException:
+        logger.warning("Couldn't check whether the page changed")
+        return None
+
+    return resp.headers.get("ETag") or resp.headers.get("Last-Modified")
@@ -1,23 +1,107 @@
 import json
-import time
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Optional, Union
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import unquote_plus
 
 import numpy as np
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
 from loguru import logger
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
+from selenium.common.exceptions import StaleElementReferenceException
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.service import Service as FirefoxService
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
+from urllib3.util.retry import Retry
 
 URL = "https://www.doge.gov/savings"
 
+# Map from fields in the page's embedded contract records to our column names
+PAYLOAD_FIELDS = {
+    "vendor": "business_name",
+    "value": "total_contract",
+    "description": "description",
+    "savings": "claimed_savings",
+}
+
+# Translation table for stripping dollar signs and commas from amounts
+_STRIP_MONEY = str.maketrans("", "", "$,")
+
+# Key/value pairs in a query string
+_QPARAM_RE = re.compile(r"(?:^|&)([^=&]*)=([^&]*)")
+
+# Number of concurrent requests to the USA Spending API
+MAX_WORKERS = 16
+
+# Timeout in seconds for each request to the USA Spending API
+SEARCH_TIMEOUT = 30
+
+# API endpoint for the USA Spending award search
+SEARCH_API = "https://api.usaspending.gov/api/v2/search/spending_by_award/"
+
+# Headers for the search POST
+SEARCH_HEADERS = {
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Connection": "keep-alive",
+    "Content-Type": "application/json",
+    "Origin": "https://www.usaspending.gov",
+    "Priority": "u=3, i",
+    "Referer": "https://www.usaspending.gov/",
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Site": "same-site",
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.2 Safari/605.1.15",
+    "X-Requested-With": "USASpendingFrontend",
+}
+
+# Award code groups to search
+AWARD_CODES = dict(
+    contracts=[
+        "A",
+        "B",
+        "C",
+        "D",
+    ],
+    idvs=[
+        "IDV_A",
+        "IDV_B",
+        "IDV_B_A",
+        "IDV_B_B",
+        "IDV_B_C",
+        "IDV_C",
+        "IDV_D",
+        "IDV_E",
+    ],
+)
+
+# Shared session so connections to the USA Spending API get reused, retrying
+# transient failures
+_SESSION = requests.Session()
+_SESSION.headers.update(SEARCH_HEADERS)
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=MAX_WORKERS,
+        pool_maxsize=2 * MAX_WORKERS,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=None,  # The search POST is safe to retry
+        ),
+    ),
+)
+
 
 def get_webdriver(
     browser: str,
@@ -69,95 +153,128 @@ def parse_popup(soup: BeautifulSoup) -> dict[str, Any]:
     # Structure of pop up differs, some only have total contract and description
     ptags = soup.select("div.fixed p")
     if len(ptags) >= 6:
-        out["claimed_savings"] = float(ptags[-5].text.replace("$", "").replace(",", ""))
-        out["total_contract"] = float(ptags[-3].text.replace("$", "").replace(",", ""))
+        out["claimed_savings"] = float(ptags[-5].text.translate(_STRIP_MONEY))
+        out["total_contract"] = float(ptags[-3].text.translate(_STRIP_MONEY))
         out["description"] = ptags[-1].text
     else:
-        out["total_contract"] = float(ptags[-2].text.replace("$", "").replace(",", ""))
+        out["total_contract"] = float(ptags[-2].text.translate(_STRIP_MONEY))
         out["description"] = ptags[-1].text
         out["claimed_savings"] = np.nan
 
     return out
 
 
+def is_contract_record(record: Any) -> bool:
+    """Check whether a payload record is a contract (they link out to FPDS)."""
+    return isinstance(record, dict) and "agency" in record and "fpds_link" in record
+
+
+def has_piid_link(record: dict[str, Any]) -> bool:
+    """Check that a contract record's FPDS link has the PIID we need."""
+    link = record["fpds_link"]
+    return isinstance(link, str) and "PIID" in get_query_params(link)
+
+
+def parse_amount(value: Any) -> float:
+    """
+    Parse a dollar amount, which may be a number or a string like "$1,234".
+
+    Missing or unparseable amounts (e.g. "N/A") become NaN.
+    """
+
+    if isinstance(value, str):
+        value = value.translate(_STRIP_MONEY)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def find_contracts(payload: Any) -> Optional[list[dict[str, Any]]]:
+    """Walk the page payload to find the array of contract records."""
+
+    if isinstance(payload, list):
+        if payload and all(is_contract_record(x) for x in payload):
+            return payload
+        children = payload
+    elif isinstance(payload, dict):
+        children = payload.values()
+    else:
+        return None
+
+    for child in children:
+        found = find_contracts(child)
+        if found is not None:
+            return found
+
+    return None
+
+
 def get_query_params(url):
+    """
+    Get the query params from a URL.
+
+    Matches `parse_qs`: blank values are dropped, values are unquoted, and
+    repeated keys give a list of values.
+    """
+    # Only look at the query string: drop any fragment, then take what's after "?"
+    query = url.partition("#")[0].partition("?")[2]
+
+    out = {}
+    for key, value in _QPARAM_RE.findall(query):
+        if not value:
+            continue
+        key, value = unquote_plus(key), unquote_plus(value)
+        if key not in out:
+            out[key] = value
+        elif isinstance(out[key], list):
+            out[key].append(value)
+        else:
+            out[key] = [out[key], value]
+
+    return out
 
-    parsed_url = urlparse(url)
-    query_params = parse_qs(parsed_url.query)
-
-    return {
-        key: value[0] if len(value) == 1 else value
-        for key, value in query_params.items()
-    }
-
-
-def get_usasavings_data(piid):
-    """Given a PIID, get the award data from the USA Spending API."""
-
-    # Headers for the search POST
-    search_headers = {
-        "Accept": "application/json, text/plain, */*",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Connection": "keep-alive",
-        "Content-Length": "600",
-        "Content-Type": "application/json",
-        "Origin": "https://www.usaspending.gov",
-        "Priority": "u=3, i",
-        "Referer": "https://www.usaspending.gov/",
-        "Sec-Fetch-Dest": "empty",
-        "Sec-Fetch-Mode": "cors",
-        "Sec-Fetch-Site": "same-site",
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.2 Safari/605.1.15",
-        "X-Requested-With": "USASpendingFrontend",
-    }
-
-    # API endpoint for the SEARCH
-    SEARCH_API = "https://api.usaspending.gov/api/v2/search/spending_by_award/"
-
-    # Try multiple award code groups
-    award_codes = dict(
-        contracts=[
-            "A",
-            "B",
-            "C",
-            "D",
-        ],
-        idvs=[
-            "IDV_A",
-            "IDV_B",
-            "IDV_B_A",
-            "IDV_B_B",
-            "IDV_B_C",
-            "IDV_C",
-            "IDV_D",
-            "IDV_E",
-        ],
-    )
+
+def get_usasavings_data(
+    piid,
+    contract_type: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+):
+    """
+    Given a PIID, get the award data from the USA Spending API.
+
+    The API only accepts award type codes from a single group per search, so
+    the FPDS contract type ("AWARD" or "IDV") is used to pick which group to
+    try first. This saves a second POST in the common case.
+    """
+
+    if session is None:
+        session = _SESSION
+
+    # Try the group matching the contract type first
+    groups = ["contracts", "idvs"]
+    if contract_type == "IDV":
+        groups = groups[::-1]
 
     # Try each
     result = None
-    for award_code_group in award_codes.values():
+    for group in groups:
 
         # Make the POST data
-        data = json.dumps(
-            {
-                "filters": {
-                    "time_period": [
-                        {"start_date": "2007-10-01", "end_date": "2025-09-30"}
-                    ],
-                    "award_type_codes": award_code_group,
-                    "award_ids": [piid],
-                },
-                "fields": [
-                    "Award ID",
-                ],
-                "limit": 1,
-            }
-        )
+        payload = {
+            "filters": {
+                "time_period": [{"start_date": "2007-10-01", "end_date": "2025-09-30"}],
+                "award_type_codes": AWARD_CODES[group],
+                "award_ids": [piid],
+            },
+            "fields": [
+                "Award ID",
+            ],
+            "limit": 1,
+        }
 
         # Do the search POST
-        resp = requests.post(SEARCH_API, headers=search_headers, data=data)
+        resp = session.post(SEARCH_API, json=payload, timeout=SEARCH_TIMEOUT)
         if resp.status_code != 200:
             raise ValueError(f"Bad status code on search POST {resp.status_code}")
 
@@ -198,6 +315,9 @@ class WebScraper:
         # Get the driver
         self.driver = get_webdriver(browser=self.browser, debug=self.debug)
 
+        # Only use explicit waits
+        self.driver.implicitly_wait(0)
+
     def cleanup(self) -> None:
         """Clean up the web driver."""
         # Close and delete the driver
@@ -219,34 +339,168 @@ class WebScraper:
             How often to log messages
         """
 
-        # Navigate to the page
+        # Navigate to the page and show the full table
         self.driver.get(URL)
+        self._show_all_contracts()
+
+        # Use the embedded contract data if we can, otherwise click through the table
+        data = None
+        records = self._fetch_json_payload()
+        if records is None:
+            logger.warning("Couldn't find embedded contract data")
+        elif len(records) < len(self._get_table_rows()) - 1:  # Skip header row
+            logger.warning("Embedded contract data is missing rows from the table")
+        else:
+            data = self._scrape_payload(records, max_results=max_results)
+
+        if data is None:
+            logger.warning("Scraping the table instead")
+            data = self._scrape_table(log_freq=log_freq, max_results=max_results)
 
-        # Click the "View all contracts" button
-        all_buttons = self.driver.find_elements(By.CSS_SELECTOR, "button")
-        matches = list(filter(lambda x: x.text == "View All Contracts", all_buttons))
-        if len(matches) != 1:
-            raise ValueError("Could not find 'View All Contracts' button")
-        matches[0].click()
+        # Log it
+        logger.debug(f"Done scraping {len(data)} rows")
+
+        # Getting USA savings URLs
+        logger.info("Getting USA savings URLs")
+
+        # Look up the IDs concurrently, keeping track of progress
+        lock = threading.Lock()
+        num_done = 0
+
+        def _safe_lookup(piid, contract_type):
+            nonlocal num_done
+
+            internal_id = None
+            try:
+                internal_id = get_usasavings_data(
+                    piid, contract_type=contract_type, session=_SESSION
+                )
+            except Exception:
+                logger.warning(f"Couldn't get internal ID for PIID {piid}")
+
+            with lock:
+                num_done += 1
+                if num_done % log_freq == 0:
+                    logger.info(f"Got USA Savings IDs for {num_done} rows")
+
+            return internal_id
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+            contract_types = data.get("contractType", [None] * len(data))
+            internal_ids = list(ex.map(_safe_lookup, data["PIID"], contract_types))
+
+        # Save this
+        data["internal_id"] = internal_ids
+
+        # Only build URLs for the rows where we found an ID
+        found = data["internal_id"].notna()
+        data["usa_savings_url"] = None
+        data.loc[found, "usa_savings_url"] = (
+            "https://www.usaspending.gov/award/"
+            + data.loc[found, "internal_id"].astype(str)
+        )
+
+        return data
+
+    def _fetch_json_payload(self) -> Optional[list[dict[str, Any]]]:
+        """
+        Get the contract records embedded in the page's `__NEXT_DATA__` script.
+
+        Returns `None` if the page doesn't embed them.
+        """
+        raw = self.driver.execute_script(
+            "const el = document.getElementById('__NEXT_DATA__');"
+            "return el ? el.innerText : null;"
+        )
+        if raw is None:
+            return None
+
+        return find_contracts(json.loads(raw))
+
+    def _scrape_payload(
+        self, records: list[dict[str, Any]], max_results: Optional[int] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Parse the CFPB contracts from the embedded contract records.
+
+        Returns `None` if there aren't any CFPB contracts, or if any of them
+        are missing the PIID in their FPDS link.
+        """
+
+        records = [
+            record
+            for record in records
+            if record["agency"] == "CONSUMER FINANCIAL PROTECTION BUREAU"
+        ]
+
+        if not records:
+            logger.warning("No CFPB contracts in the embedded contract data")
+            return None
+        if not all(has_piid_link(record) for record in records):
+            logger.warning("Embedded CFPB contracts are missing PIIDs")
+            return None
+
+        # Trim if we have too much data (this is for testing purposes)
+        if max_results is not None:
+            records = records[:max_results]
+
+        # Build up each column directly
+        agencies, urls = [], []
+        columns = {column: [] for column in PAYLOAD_FIELDS.values()}
+        for record in records:
+            agencies.append(record["agency"])
+            urls.append(record["fpds_link"])
+            for field, column in PAYLOAD_FIELDS.items():
+                value = record.get(field)  # Some fields are optional
+                if column in ["total_contract", "claimed_savings"]:
+                    value = parse_amount(value)
+                columns[column].append(value)
+
+        # Add the query params from the FPDS url after the url
+        params = pd.DataFrame([get_query_params(url) for url in urls])
+        data = pd.concat(
+            [
+                pd.DataFrame({"agency": agencies, "url": urls}),
+                params,
+                pd.DataFrame(columns),
+            ],
+            axis=1,
+        )
+
+        return data
+
+    def _scrape_table(
+        self, log_freq: int = 100, max_results: Optional[int] = None
+    ) -> pd.DataFrame:
+        """Scrape the CFPB contracts by clicking through each row of the table."""
 
         # Initialize the soup object
-        soup = BeautifulSoup(self.driver.page_source, "html.parser")
+        soup = BeautifulSoup(self.driver.page_source, "lxml")
         table = soup.select("table")[0]
 
+        # Get the table rows in the browser once, rather than for every row
+        row_elements = self._get_table_rows()
+
+        # Find the CFPB rows up front so we only loop over those
+        all_trs = table.select("tr")[1:]  # Skip header row
+        cfpb_indices = [
+            i
+            for i, tr in enumerate(all_trs)
+            if tr.select_one("td").text == "CONSUMER FINANCIAL PROTECTION BUREAU"
+        ]
+
         data = []
-        for i, tr in enumerate(table.select("tr")[1:]):  # Skip header row
+        for i in cfpb_indices:
 
             # Break if we have enough data (this is for testing purposes)
             if max_results is not None and len(data) >= max_results:
                 break
 
-            tds = tr.select("td")
+            tds = all_trs[i].select("td")
             d = {}  # Store parsed info
 
             # The agency
             d["agency"] = tds[0].text
-            if d["agency"] != "CONSUMER FINANCIAL PROTECTION BUREAU":
-                continue
 
             # Log
             if len(data) % log_freq == 0:
@@ -263,26 +517,24 @@ class WebScraper:
             if d["url"]:
                 d.update(get_query_params(d["url"]))
 
-            # Find the row in the table that we want to click
-            table = self.driver.find_element(By.CSS_SELECTOR, "table")
-            button = table.find_elements(By.CSS_SELECTOR, "tr")[i + 1]
-
-            # Scroll the row into view
-            self.driver.execute_script(
-                "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
-                button,
-            )
-
-            # Wait for the scroll to happen
-            time.sleep(1)
-
-            # Wait again to ensure we can click
-            self.driver.implicitly_wait(10)
-            ActionChains(self.driver).move_to_element(button).click(button).perform()
+            # Find the row in the table that we want to click and scroll it into
+            # view, getting the rows again if the page re-rendered them
+            button = row_elements[i + 1]
+            try:
+                self._scroll_into_view(button)
+            except StaleElementReferenceException:
+                row_elements = self._get_table_rows()
+                button = row_elements[i + 1]
+                self._scroll_into_view(button)
 
-            # Wait for the popup to load
             try:
+                # Wait until we can click
                 wait = WebDriverWait(self.driver, 5)
+                wait.until(EC.element_to_be_clickable(button))
+                actions = ActionChains(self.driver)
+                actions.move_to_element(button).click(button).perform()
+
+                # Wait for the popup to load
                 wait.until(
                     EC.presence_of_element_located((By.CSS_SELECTOR, "div.fixed h3"))
                 )
@@ -292,47 +544,38 @@ class WebScraper:
                 continue
 
             # Parse popup info and save it
-            extra_info = parse_popup(
-                BeautifulSoup(self.driver.page_source, "html.parser")
-            )
+            extra_info = parse_popup(BeautifulSoup(self.driver.page_source, "lxml"))
             d.update(extra_info)
 
-            # Close the popup by clicking the "Close" button
-            button = self.driver.find_element(
-                By.CSS_SELECTOR, "div.fixed button:nth-child(2)"
+            # Close the popup by clicking the "Close" button once it's clickable
+            button = WebDriverWait(self.driver, 5).until(
+                EC.element_to_be_clickable(
+                    (By.CSS_SELECTOR, "div.fixed button:nth-child(2)")
+                )
             )
             button.click()
 
             # Save the data
             data.append(d)
 
-        # Log it
-        logger.debug(f"Done scraping {len(data)} rows")
+        return pd.DataFrame(data)
 
-        # Convert to a dataframe
-        data = pd.DataFrame(data)
-
-        # Getting USA savings URLs
-        logger.info("Getting USA savings URLs")
-
-        internal_ids = []
-        for i, piid in enumerate(data["PIID"]):
-
-            if i % log_freq == 0:
-                logger.info(f"Getting USA Savings ID for row #{i+1}")
+    def _show_all_contracts(self) -> None:
+        """Click the "View All Contracts" button so the table has every row."""
+        all_buttons = self.driver.find_elements(By.CSS_SELECTOR, "button")
+        matches = list(filter(lambda x: x.text == "View All Contracts", all_buttons))
+        if len(matches) != 1:
+            raise ValueError("Could not find 'View All Contracts' button")
+        matches[0].click()
 
-            internal_id = None
-            try:
-                internal_id = get_usasavings_data(piid)
-            except Exception:
-                logger.warning(f"Couldn't get internal ID for PIID {piid}")
-                pass
-            internal_ids.append(internal_id)
+    def _get_table_rows(self) -> list[WebElement]:
+        """Get the row elements of the contracts table in the browser."""
+        table = self.driver.find_element(By.CSS_SELECTOR, "table")
+        return table.find_elements(By.CSS_SELECTOR, "tr")
 
-        # Save this
-        data["internal_id"] = internal_ids
-        data["usa_savings_url"] = (
-            "https://www.usaspending.gov/award/" + data["internal_id"]
+    def _scroll_into_view(self, element: WebElement) -> None:
+        """Scroll the element to the center of the page."""
+        self.driver.execute_script(
+            "arguments[0].scrollIntoView({behavior: 'instant', block: 'center'});",
+            element,
         )
-
-        return data